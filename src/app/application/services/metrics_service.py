@@ -49,18 +49,30 @@ class MetricsService:
         )
 
     def by_unit(self):
-        stmt = (
+        # Aggregate the fact table by FK first so sale is scanned once and units are
+        # looked up by primary key, instead of re-reading sale for every unit.
+        per_unit = (
             select(
-                Unit.unit_code,
-                Unit.name,
+                Sale.unit_id,
                 func.sum(Sale.total_value).label("revenue"),
                 func.sum(Sale.margin_value).label("margin"),
-                (func.sum(Sale.margin_value) / func.sum(Sale.total_value)).label("margin_pct"),
                 func.count(Sale.id).label("orders"),
             )
-            .join(Sale.unit)
-            .group_by(Unit.unit_code, Unit.name)
-            .order_by(func.sum(Sale.total_value).desc())
+            .group_by(Sale.unit_id)
+            .subquery()
+        )
+        stmt = (
+            select(
+                Unit.unit_code,
+                Unit.name,
+                per_unit.c.revenue,
+                per_unit.c.margin,
+                (per_unit.c.margin / per_unit.c.revenue).label("margin_pct"),
+                per_unit.c.orders,
+            )
+            .select_from(per_unit)
+            .join(Unit, Unit.id == per_unit.c.unit_id)
+            .order_by(per_unit.c.revenue.desc(), Unit.unit_code)
         )
         rows = self.session.execute(stmt).all()
         return [
@@ -125,17 +137,28 @@ class MetricsService:
         ]
 
     def by_waiter(self):
-        stmt = (
+        # Same shape as by_unit: aggregate sale per FK, then join the dimension.
+        per_waiter = (
             select(
-                Waiter.name,
+                Sale.waiter_id,
                 func.sum(Sale.total_value).label("revenue"),
                 func.sum(Sale.margin_value).label("margin"),
-                (func.sum(Sale.margin_value) / func.sum(Sale.total_value)).label("margin_pct"),
                 func.count(Sale.id).label("orders"),
             )
-            .join(Sale.waiter)
-            .group_by(Waiter.name)
-            .order_by(func.sum(Sale.total_value).desc())
+            .group_by(Sale.waiter_id)
+            .subquery()
+        )
+        stmt = (
+            select(
+                Waiter.name,
+                per_waiter.c.revenue,
+                per_waiter.c.margin,
+                (per_waiter.c.margin / per_waiter.c.revenue).label("margin_pct"),
+                per_waiter.c.orders,
+            )
+            .select_from(per_waiter)
+            .join(Waiter, Waiter.id == per_waiter.c.waiter_id)
+            .order_by(per_waiter.c.revenue.desc(), Waiter.name)
         )
         rows = self.session.execute(stmt).all()
         return [
@@ -8,6 +8,10 @@ class Settings(BaseSettings):
     postgres_password: str = "analytics"
     postgres_db: str = "sabores"
     app_name: str = "sabores-observability"
+    slow_query_threshold_ms: float = 200.0
+    slow_query_log_size: int = 100
+    slow_query_capture_plan: bool = True
+    slow_query_endpoint_enabled: bool = False
 
     def db_url(self) -> str:
         return (
@@ -2,8 +2,15 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.config.settings import settings
+from app.infrastructure.db.slow_query_log import SlowQueryLog
 
 engine = create_engine(settings.db_url(), pool_pre_ping=True, echo=False, future=True)
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.slow_query_threshold_ms,
+    max_entries=settings.slow_query_log_size,
+    capture_plan=settings.slow_query_capture_plan,
+)
+slow_query_log.install(engine)
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False, autoflush=False, future=True)
 
 
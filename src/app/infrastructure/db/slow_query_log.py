@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import reprlib
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# ANALYZE re-executes the statement, so it is reserved for plain SELECTs; a WITH may
+# hold a data-modifying CTE and only gets the estimated plan. SQLite's EXPLAIN QUERY
+# PLAN does not run the statement at all.
+_EXPLAIN_PREFIXES = {
+    "postgresql": {"select": "EXPLAIN (ANALYZE, BUFFERS) ", "with": "EXPLAIN "},
+    "sqlite": {"select": "EXPLAIN QUERY PLAN ", "with": "EXPLAIN QUERY PLAN "},
+}
+_START_TIMES_KEY = "slow_query_log_start_times"
+_MAX_STATEMENT_LENGTH = 4000
+_MAX_PARAMETERS_LENGTH = 1000
+
+# Batched inserts can carry thousands of parameters; keep each record small.
+_parameters_repr = reprlib.Repr()
+_parameters_repr.maxlist = _parameters_repr.maxtuple = _parameters_repr.maxdict = 20
+_parameters_repr.maxstring = _parameters_repr.maxother = 200
+
+
+def _truncate(value: str, limit: int) -> str:
+    return value if len(value) <= limit else value[:limit] + "..."
+
+
+@dataclass
+class SlowQueryRecord:
+    statement: str
+    parameters: str
+    duration_ms: float
+    recorded_at: datetime
+    plan: list[str] = field(default_factory=list)
+
+    def to_dict(self):
+        data = asdict(self)
+        data["recorded_at"] = self.recorded_at.isoformat()
+        return data
+
+
+class SlowQueryLog:
+    """Bounded ring buffer of statements slower than a threshold, with their plans."""
+
+    def __init__(self, threshold_ms: float = 200.0, max_entries: int = 100, capture_plan: bool = True) -> None:
+        self.threshold_ms = threshold_ms
+        self.capture_plan = capture_plan
+        self._records: deque[SlowQueryRecord] = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def install(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+
+    def uninstall(self, engine: Engine) -> None:
+        event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.remove(engine, "handle_error", self._handle_error)
+
+    def records(self) -> list[SlowQueryRecord]:
+        with self._lock:
+            return list(self._records)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault(_START_TIMES_KEY, []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        start_times = conn.info.get(_START_TIMES_KEY)
+        if not start_times:
+            # Installed mid-statement or out of sync; never fail the caller's query.
+            return
+        duration_ms = (time.perf_counter() - start_times.pop()) * 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        plan: list[str] = []
+        if self.capture_plan and not executemany:
+            plan = self._explain(cursor, statement, parameters, conn.dialect.name)
+
+        record = SlowQueryRecord(
+            statement=_truncate(statement, _MAX_STATEMENT_LENGTH),
+            parameters=_truncate(_parameters_repr.repr(parameters), _MAX_PARAMETERS_LENGTH),
+            duration_ms=round(duration_ms, 3),
+            recorded_at=datetime.now(timezone.utc),
+            plan=plan,
+        )
+        with self._lock:
+            self._records.append(record)
+
+    def _handle_error(self, exception_context) -> None:
+        conn = exception_context.connection
+        if conn is not None and conn.info.get(_START_TIMES_KEY):
+            conn.info[_START_TIMES_KEY].pop()
+
+    @staticmethod
+    def _explain(cursor, statement: str, parameters: Any, dialect_name: str) -> list[str]:
+        keyword = statement.split(None, 1)[0].lower() if statement.strip() else ""
+        prefix = _EXPLAIN_PREFIXES.get(dialect_name, {}).get(keyword)
+        if prefix is None:
+            return []
+
+        # Raw DBAPI cursor on the same connection: sees the caller's transaction and
+        # does not re-enter these event hooks.
+        explain_cursor = cursor.connection.cursor()
+        try:
+            if dialect_name == "postgresql":
+                rows = _explain_in_savepoint(explain_cursor, prefix + statement, parameters)
+            else:
+                explain_cursor.execute(prefix + statement, parameters)
+                rows = explain_cursor.fetchall()
+        except Exception as exc:
+            return [f"EXPLAIN failed: {exc}"]
+        finally:
+            explain_cursor.close()
+
+        if dialect_name == "sqlite":
+            return _format_sqlite_plan(rows)
+        return [row[0] for row in rows]
+
+
+def _explain_in_savepoint(cursor, explain_statement: str, parameters: Any) -> list[tuple]:
+    """Run EXPLAIN inside a savepoint that is always rolled back.
+
+    Rolling back discards anything ANALYZE wrote (volatile functions in a SELECT, such as
+    nextval(), still advance their sequences) and clears the aborted state a failing
+    EXPLAIN would otherwise leave on the caller's transaction.
+    """
+    cursor.execute("SAVEPOINT slow_query_explain")
+    try:
+        cursor.execute(explain_statement, parameters)
+        return cursor.fetchall()
+    finally:
+        cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+        cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+
+
+def _format_sqlite_plan(rows) -> list[str]:
+    """Render EXPLAIN QUERY PLAN rows (id, parent, notused, detail) as an indented tree."""
+    depths: dict[int, int] = {0: -1}
+    lines = []
+    for node_id, parent_id, _, detail in rows:
+        depth = depths.get(parent_id, -1) + 1
+        depths[node_id] = depth
+        lines.append("  " * depth + detail)
+    return lines
@@ -1,7 +1,8 @@
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, HTTPException
 
 from app.application.services.metrics_service import MetricsService
-from app.infrastructure.db.session import get_session
+from app.config.settings import settings
+from app.infrastructure.db.session import get_session, slow_query_log
 
 app = FastAPI(title="Sabores Observability API", version="1.0.0")
 
@@ -45,3 +46,23 @@ def metrics_by_waiter(session=Depends(get_session)):
 def metrics_geography(session=Depends(get_session)):
     service = MetricsService(session)
     return service.by_geography()
+
+
+def _require_slow_query_endpoint():
+    """Statements and parameters may hold sensitive data; the endpoint is opt-in."""
+    if not settings.slow_query_endpoint_enabled:
+        raise HTTPException(status_code=404)
+
+
+@app.get("/internal/slow-queries", include_in_schema=False, dependencies=[Depends(_require_slow_query_endpoint)])
+def slow_queries():
+    return {
+        "threshold_ms": slow_query_log.threshold_ms,
+        "queries": [record.to_dict() for record in reversed(slow_query_log.records())],
+    }
+
+
+@app.delete("/internal/slow-queries", include_in_schema=False, dependencies=[Depends(_require_slow_query_endpoint)])
+def clear_slow_queries():
+    slow_query_log.clear()
+    return {"status": "cleared"}
@@ -0,0 +1,280 @@
+import inspect
+import random
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.application.services.metrics_service import MetricsService
+from app.infrastructure.db import models
+from app.infrastructure.db.base import Base
+from app.infrastructure.db.slow_query_log import (
+    _MAX_PARAMETERS_LENGTH,
+    _MAX_STATEMENT_LENGTH,
+    _START_TIMES_KEY,
+    SlowQueryLog,
+)
+
+FACT_TABLE = "sale"
+# Whole-table aggregates legitimately read every sale row once.
+FULL_SCAN_METHODS = {"summary", "monthly", "by_unit", "by_waiter", "by_category", "by_geography"}
+# Filtered methods must reach sale through an index; add them here.
+INDEXED_METHODS: set[str] = set()
+METRICS_METHODS = sorted(
+    name for name, _ in inspect.getmembers(MetricsService, inspect.isfunction) if not name.startswith("_")
+)
+
+
+def _generate_dataset(session, sales: int = 2000, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    units = [
+        models.Unit(
+            unit_code=f"U{i:02d}",
+            name=f"Unidade {i}",
+            city=rng.choice(["São Paulo", "Campinas", "Porto Alegre"]),
+            state=rng.choice(["SP", "RS"]),
+        )
+        for i in range(20)
+    ]
+    products = [
+        models.Product(
+            product_code=f"P{i:03d}",
+            name=f"Produto {i}",
+            category=rng.choice(["Pratos", "Bebidas", "Porções", None]),
+            cost_unit=5,
+            price=12,
+        )
+        for i in range(50)
+    ]
+    waiters = [models.Waiter(name=f"Garçom {i}") for i in range(15)]
+    session.add_all(units + products + waiters)
+    session.flush()
+
+    for i in range(sales):
+        order_date = date(2025, rng.randint(1, 12), rng.randint(1, 28))
+        quantity = rng.randint(1, 4)
+        session.add(
+            models.Sale(
+                order_code=f"PED{i:05d}",
+                order_date=order_date,
+                month_year=order_date.replace(day=1),
+                unit=rng.choice(units),
+                waiter=rng.choice(waiters),
+                product=rng.choice(products),
+                quantity=quantity,
+                unit_price=12,
+                total_value=12 * quantity,
+                margin_value=7 * quantity,
+                margin_pct=7 / 12,
+            )
+        )
+    session.commit()
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, expire_on_commit=False, autoflush=False, future=True)
+    with SessionLocal() as session:
+        _generate_dataset(session)
+        session.execute(text("ANALYZE"))
+        session.commit()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture()
+def session(engine):
+    SessionLocal = sessionmaker(bind=engine, expire_on_commit=False, autoflush=False, future=True)
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture()
+def query_log(engine):
+    # Threshold 0 records every statement, so each one gets its plan captured.
+    log = SlowQueryLog(threshold_ms=0)
+    log.install(engine)
+    yield log
+    log.uninstall(engine)
+
+
+def _is_loop(line: str) -> bool:
+    return line.strip().startswith(("SCAN ", "SEARCH "))
+
+
+def _join_scopes(plan: list[str]) -> list[list[str]]:
+    """Group loop lines by parent plan node; within a scope SQLite lists loops outer to inner."""
+    scopes: dict[int | None, list[str]] = {}
+    parents: list[int] = []
+    for index, line in enumerate(plan):
+        depth = (len(line) - len(line.lstrip())) // 2
+        del parents[depth:]
+        if _is_loop(line):
+            scopes.setdefault(parents[-1] if parents else None, []).append(line.strip())
+        parents.append(index)
+    return list(scopes.values())
+
+
+@pytest.mark.parametrize("method", METRICS_METHODS)
+def test_metrics_query_plan_shape(session, query_log, method):
+    assert method in FULL_SCAN_METHODS | INDEXED_METHODS, (
+        f"{method}: classify it in FULL_SCAN_METHODS or INDEXED_METHODS"
+    )
+    getattr(MetricsService(session), method)()
+
+    records = query_log.records()
+    assert records, f"{method} executed no statements"
+    for record in records:
+        loops = [line.strip() for line in record.plan if _is_loop(line)]
+        assert loops, f"{method}: no plan captured: {record.plan}"
+        # The fact table must drive the join: read once, as the outermost loop.
+        assert loops[0].split()[1] == FACT_TABLE, f"{method}: fact table is not the outer loop: {record.plan}"
+        assert all(loop.split()[1] != FACT_TABLE for loop in loops[1:]), f"{method}: nested loop over fact: {record.plan}"
+        if method not in FULL_SCAN_METHODS:
+            assert loops[0].startswith(f"SEARCH {FACT_TABLE} USING ") and "INDEX" in loops[0], (
+                f"{method}: fact table read without an index: {record.plan}"
+            )
+        for scope in _join_scopes(record.plan):
+            for loop in scope[1:]:
+                # Inner loops must be primary-key/index lookups; a nested SCAN is a full pass per outer row.
+                assert loop.startswith("SEARCH "), f"{method}: nested full scan: {record.plan}"
+                assert "INDEX" in loop or "PRIMARY KEY" in loop, f"{method}: inner loop without index: {record.plan}"
+        assert not any("AUTOMATIC" in loop for loop in loops), f"{method}: planner built a transient index: {record.plan}"
+
+
+def test_slow_query_log_respects_threshold(session, engine):
+    log = SlowQueryLog(threshold_ms=60_000)
+    log.install(engine)
+    try:
+        MetricsService(session).summary()
+    finally:
+        log.uninstall(engine)
+    assert log.records() == []
+
+
+def test_slow_query_log_is_bounded(session, engine):
+    log = SlowQueryLog(threshold_ms=0, max_entries=2)
+    log.install(engine)
+    try:
+        service = MetricsService(session)
+        service.summary()
+        service.monthly()
+        service.by_unit()
+    finally:
+        log.uninstall(engine)
+    records = log.records()
+    assert len(records) == 2
+    assert "unit" in records[-1].statement
+    assert records[-1].to_dict()["duration_ms"] >= 0
+
+
+def test_slow_query_log_skips_plan_for_writes(session, query_log):
+    session.execute(text("update waiter set name = name where name = :name"), {"name": "Garçom 0"})
+    session.rollback()
+    record = query_log.records()[-1]
+    assert record.statement.startswith("update")
+    assert record.plan == []
+
+
+def test_slow_query_log_caps_record_size(session, query_log):
+    long_select = "select " + ", ".join(["1"] * 2000)
+    session.execute(text(long_select + " where :payload is not null"), {"payload": "x" * 10_000})
+    record = query_log.records()[-1]
+    assert len(record.statement) <= _MAX_STATEMENT_LENGTH + len("...")
+    assert len(record.parameters) <= _MAX_PARAMETERS_LENGTH + len("...")
+
+
+def test_slow_query_log_ignores_statement_without_start_time(engine):
+    log = SlowQueryLog(threshold_ms=0)
+    with engine.connect() as conn:
+        conn.info.pop(_START_TIMES_KEY, None)
+        log._after_cursor_execute(conn, None, "select 1", (), None, False)
+    assert log.records() == []
+
+
+class _FakePgConnection:
+    """Postgres-like transaction state: after an error every statement fails until ROLLBACK TO SAVEPOINT."""
+
+    def __init__(self, fail_explain: bool = False) -> None:
+        self.fail_explain = fail_explain
+        self.executed: list[str] = []
+        self.savepoints: list[str] = []
+        self.aborted = False
+
+    def cursor(self):
+        return _FakePgCursor(self)
+
+
+class _FakePgCursor:
+    def __init__(self, connection: _FakePgConnection) -> None:
+        self.connection = connection
+        self._rows: list[tuple] = []
+
+    def execute(self, statement, parameters=None):
+        conn = self.connection
+        conn.executed.append(statement)
+        if statement.startswith("ROLLBACK TO SAVEPOINT "):
+            assert statement.split()[-1] in conn.savepoints
+            conn.aborted = False
+            return
+        if conn.aborted:
+            raise RuntimeError("current transaction is aborted")
+        if statement.startswith("SAVEPOINT "):
+            conn.savepoints.append(statement.split()[-1])
+        elif statement.startswith("RELEASE SAVEPOINT "):
+            conn.savepoints.remove(statement.split()[-1])
+        elif statement.startswith("EXPLAIN") and conn.fail_explain:
+            conn.aborted = True
+            raise RuntimeError("canceling statement due to statement timeout")
+        elif statement.startswith("EXPLAIN"):
+            self._rows = [("Seq Scan on sale  (actual rows=2000 loops=1)",), ("Execution Time: 1.2 ms",)]
+        else:
+            self._rows = [(1,)]
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+def _assert_transaction_usable(conn: _FakePgConnection) -> None:
+    assert conn.savepoints == []
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1")
+    assert cursor.fetchall() == [(1,)]
+
+
+def test_postgres_explain_rolls_back_savepoint():
+    conn = _FakePgConnection()
+    plan = SlowQueryLog._explain(conn.cursor(), "SELECT sum(total_value) FROM sale", {}, "postgresql")
+
+    assert plan == ["Seq Scan on sale  (actual rows=2000 loops=1)", "Execution Time: 1.2 ms"]
+    assert conn.executed == [
+        "SAVEPOINT slow_query_explain",
+        "EXPLAIN (ANALYZE, BUFFERS) SELECT sum(total_value) FROM sale",
+        "ROLLBACK TO SAVEPOINT slow_query_explain",
+        "RELEASE SAVEPOINT slow_query_explain",
+    ]
+    _assert_transaction_usable(conn)
+
+
+def test_postgres_explain_failure_keeps_transaction_usable():
+    conn = _FakePgConnection(fail_explain=True)
+    plan = SlowQueryLog._explain(conn.cursor(), "SELECT sum(total_value) FROM sale", {}, "postgresql")
+
+    assert plan[0].startswith("EXPLAIN failed:")
+    assert conn.executed[-2:] == ["ROLLBACK TO SAVEPOINT slow_query_explain", "RELEASE SAVEPOINT slow_query_explain"]
+    _assert_transaction_usable(conn)
+
+
+def test_postgres_explain_skips_analyze_for_cte():
+    conn = _FakePgConnection()
+    statement = "WITH d AS (DELETE FROM sale RETURNING id) SELECT count(*) FROM d"
+    SlowQueryLog._explain(conn.cursor(), statement, {}, "postgresql")
+
+    assert conn.executed[1] == "EXPLAIN " + statement
+    _assert_transaction_usable(conn)
@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app import main
+from app.config.settings import settings
+from app.infrastructure.db.slow_query_log import SlowQueryRecord
+
+
+@pytest.fixture()
+def recorded_query():
+    record = SlowQueryRecord(
+        statement="SELECT sum(total_value) FROM sale",
+        parameters="()",
+        duration_ms=250.0,
+        recorded_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        plan=["SCAN sale"],
+    )
+    main.slow_query_log._records.append(record)
+    yield record
+    main.slow_query_log.clear()
+
+
+def test_slow_query_endpoint_disabled_by_default(monkeypatch):
+    monkeypatch.setattr(settings, "slow_query_endpoint_enabled", False)
+    with pytest.raises(HTTPException) as exc_info:
+        main._require_slow_query_endpoint()
+    assert exc_info.value.status_code == 404
+
+
+def test_slow_query_endpoint_lists_and_clears(monkeypatch, recorded_query):
+    monkeypatch.setattr(settings, "slow_query_endpoint_enabled", True)
+    main._require_slow_query_endpoint()
+
+    body = main.slow_queries()
+    assert body["threshold_ms"] == main.slow_query_log.threshold_ms
+    assert body["queries"] == [recorded_query.to_dict()]
+    assert body["queries"][0]["recorded_at"] == "2025-01-01T00:00:00+00:00"
+
+    assert main.clear_slow_queries() == {"status": "cleared"}
+    assert main.slow_queries()["queries"] == []